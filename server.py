@@ -6,18 +6,18 @@ All-in-one server file - Replace debug.py with this
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, ORJSONResponse
 from dotenv import load_dotenv
-from collections import defaultdict, Counter
-from datetime import datetime, timedelta, timezone
+from collections import defaultdict, deque, Counter, OrderedDict
+from datetime import datetime, timezone
 import asyncio
-import json
+import orjson
 import os
 import requests
 import random
-from typing import Dict, Set, List
+import time
+from typing import Deque, Dict, Set, List, NamedTuple, Optional
 import numpy as np
-from sklearn.preprocessing import StandardScaler
 from sklearn.cluster import DBSCAN
 import uvicorn
 
@@ -29,7 +29,10 @@ HONEY_ID = os.getenv("HONEY_ID")
 HONEY_KEY = os.getenv("HONEY_KEY")
 
 # Initialize FastAPI app
-app = FastAPI(title="Cyber Threat Intelligence Dashboard with Campaign Detection")
+app = FastAPI(
+    title="Cyber Threat Intelligence Dashboard with Campaign Detection",
+    default_response_class=ORJSONResponse
+)
 
 # CORS middleware
 app.add_middleware(
@@ -48,131 +51,136 @@ app.mount("/static", StaticFiles(directory="."), name="static")
 # CAMPAIGN DETECTION ML MODEL
 # ============================================================================
 
+class AttackRecord(NamedTuple):
+    """History entry: the public attack payload plus detector-only fields"""
+    attack: dict
+    ts_epoch: float
+    src_code: int
+    tgt_code: int
+    atk_code: int
+
 class CampaignDetector:
     """Detects coordinated attack campaigns using DBSCAN clustering"""
     
-    def __init__(self):
+    def __init__(self, max_tracked_attacks=5000):
         self.campaigns = {}
-        self.attack_to_campaign = {}
+        self.attack_to_campaign = OrderedDict()
+        self.max_tracked_attacks = max_tracked_attacks
         self.next_campaign_id = 1
+        self._latest = None
+        self._last_n = 0
     
-    def create_attack_features(self, attack):
-        """Convert attack to 8-dimensional feature vector"""
-        timestamp = datetime.fromisoformat(attack['timestamp'].replace('Z', '+00:00'))
-        
-        features = {
-            'hour': timestamp.hour,
-            'day': timestamp.weekday(),
-            'country_code': self._country_to_code(attack['source_country']),
-            'attack_type_code': self._attack_type_to_code(attack['attack_type']),
-            'intensity': attack['intensity'],
-            'target_country_code': self._country_to_code(attack['target_country']),
-            'lat': attack.get('source_lat', 0),
-            'lng': attack.get('source_lng', 0),
-        }
-        
-        return features
-    
-    def _country_to_code(self, country):
-        """Map country to numeric code"""
-        country_codes = {
-            "United States": 1, "China": 2, "Russia": 3, "Germany": 4,
-            "United Kingdom": 5, "France": 6, "Japan": 7, "Brazil": 8,
-            "India": 9, "South Korea": 10, "Canada": 11, "Australia": 12,
-            "Netherlands": 13, "Poland": 14, "Sweden": 15
-        }
-        return country_codes.get(country, 0)
-    
-    def _attack_type_to_code(self, attack_type):
-        """Map attack type to numeric code"""
-        type_codes = {
-            "DDoS": 1, "Botnet": 2, "Ransomware": 3, "Malware": 4,
-            "Phishing": 5, "SQL Injection": 6, "XSS": 7, "Brute Force": 8
-        }
-        return type_codes.get(attack_type, 0)
-    
-    def detect_campaigns(self, attack_history, min_attacks_per_campaign=3):
+    def detect_campaigns(self, attack_history, min_attacks_per_campaign=3, eps=0.5):
         """Detect campaigns using DBSCAN clustering"""
         
         if len(attack_history) < min_attacks_per_campaign:
             return []
         
-        # Extract features
-        features_list = []
-        attack_ids = []
+        # Cluster members are looked up by position, and indexing into a deque
+        # is O(n) away from its ends, so copy only when not given a list
+        records = attack_history if isinstance(attack_history, list) else list(attack_history)
+        n = len(records)
+        attack_ids = [record.attack['id'] for record in records]
         
-        for attack in attack_history:
-            features = self.create_attack_features(attack)
-            feature_vector = [
-                features['hour'],
-                features['day'],
-                features['country_code'],
-                features['attack_type_code'],
-                features['intensity'],
-                features['target_country_code'],
-                features['lat'] / 90,
-                features['lng'] / 180
-            ]
-            features_list.append(feature_vector)
-            attack_ids.append(attack['id'])
+        def column(values, dtype):
+            return np.fromiter(values, dtype, n)
         
-        X = np.array(features_list)
+        # Extract features column-wise from the fields stored at generation time.
+        # Epoch seconds need float64; every feature column fits in float32
+        ts = column((r.ts_epoch for r in records), np.float64)
+        X = np.empty((n, 8), dtype=np.float32)
+        X[:, 0] = (ts // 3600) % 24
+        X[:, 1] = (ts // 86400 + 3) % 7  # epoch day 0 was a Thursday (weekday 3)
+        X[:, 2] = column((r.src_code for r in records), np.int8)
+        X[:, 3] = column((r.atk_code for r in records), np.int8)
+        X[:, 4] = column((r.attack['intensity'] for r in records), np.int8)
+        X[:, 5] = column((r.tgt_code for r in records), np.int8)
+        X[:, 6] = column((r.attack['source_lat'] for r in records), np.float32) / 90
+        X[:, 7] = column((r.attack['source_lng'] for r in records), np.float32) / 180
         
-        # Normalize features
-        scaler = StandardScaler()
-        X_scaled = scaler.fit_transform(X)
+        # Normalize features (one-pass mean/variance, clamped against rounding below zero)
+        mu = X.mean(axis=0)
+        var = np.maximum((X * X).mean(axis=0) - mu * mu, 0)
+        X_scaled = (X - mu) / np.sqrt(var + 1e-5)
         
-        # DBSCAN clustering
-        clustering = DBSCAN(eps=0.5, min_samples=min_attacks_per_campaign)
+        # DBSCAN clustering, with the neighborhood queries run in parallel
+        clustering = DBSCAN(eps=eps, min_samples=min_attacks_per_campaign, n_jobs=-1)
         labels = clustering.fit_predict(X_scaled)
         
-        # Form campaigns from clusters
+        # Form campaigns from clusters: a stable sort groups each cluster into
+        # one contiguous, still chronological, slice of indices
+        order = np.argsort(labels, kind='stable')
+        sorted_labels = labels[order]
+        boundaries = np.flatnonzero(np.diff(sorted_labels)) + 1
+        starts = np.concatenate(([0], boundaries))
+        ends = np.concatenate((boundaries, [len(labels)]))
+        
         detected_campaigns = []
-        for cluster_id in set(labels):
-            if cluster_id == -1:  # Noise
+        for start, end in zip(starts, ends):
+            if sorted_labels[start] == -1:  # Noise
                 continue
             
-            cluster_indices = np.where(labels == cluster_id)[0]
-            cluster_attacks = [attack_history[i] for i in cluster_indices]
+            cluster_indices = order[start:end]
+            cluster_records = [records[i] for i in cluster_indices]
             cluster_attack_ids = [attack_ids[i] for i in cluster_indices]
             
-            campaign = self._create_campaign(cluster_attacks, cluster_attack_ids)
+            campaign = self._create_campaign(cluster_records, cluster_attack_ids)
             detected_campaigns.append(campaign)
             
             for attack_id in cluster_attack_ids:
                 self.attack_to_campaign[attack_id] = campaign['campaign_id']
+                self.attack_to_campaign.move_to_end(attack_id)
         
+        # Forget the oldest assignments once they can no longer be in the history
+        while len(self.attack_to_campaign) > self.max_tracked_attacks:
+            self.attack_to_campaign.popitem(last=False)
+        
+        # Keep only the latest run's campaigns; earlier runs covered the same history
+        self.campaigns = {campaign['campaign_id']: campaign for campaign in detected_campaigns}
         return detected_campaigns
     
-    def _create_campaign(self, attacks, attack_ids):
+    def refresh(self, attack_history, attacks_seen):
+        """Re-run detection and cache the result for the HTTP handler"""
+        campaigns = self.detect_campaigns(attack_history)
+        self._latest = (campaigns, len(attack_history))
+        self._last_n = attacks_seen
+        return campaigns
+    
+    def latest(self):
+        """Cached (campaigns, attacks analyzed) from the last detection run"""
+        return self._latest or ([], 0)
+    
+    def is_stale(self, attacks_seen, min_new_attacks=50):
+        """Whether enough new attacks arrived since the cached detection run"""
+        return self._latest is None or attacks_seen - self._last_n >= min_new_attacks
+    
+    def _create_campaign(self, records, attack_ids):
         """Create campaign object from clustered attacks"""
         
-        timestamps = [
-            datetime.fromisoformat(a['timestamp'].replace('Z', '+00:00'))
-            for a in attacks
-        ]
+        num_attacks = len(records)
+        timestamps = np.fromiter((r.ts_epoch for r in records), np.float64, num_attacks)
         
-        start_time = min(timestamps)
-        end_time = max(timestamps)
-        duration_minutes = (end_time - start_time).total_seconds() / 60
+        start_epoch = float(timestamps.min())
+        end_epoch = float(timestamps.max())
+        start_time = datetime.fromtimestamp(start_epoch, timezone.utc)
+        end_time = datetime.fromtimestamp(end_epoch, timezone.utc)
+        duration_minutes = (end_epoch - start_epoch) / 60
         
-        countries = defaultdict(int)
-        for attack in attacks:
-            countries[attack['source_country']] += 1
-        primary_country = max(countries, key=countries.get)
+        source_codes = np.fromiter((r.src_code for r in records), np.int16, num_attacks)
+        primary_code = int(np.bincount(source_codes).argmax())
+        primary_country = COUNTRY_BY_CODE[primary_code]
         
-        attack_types = defaultdict(int)
-        for attack in attacks:
-            attack_types[attack['attack_type']] += 1
+        type_codes = np.fromiter((r.atk_code for r in records), np.int16, num_attacks)
+        type_counts = np.bincount(type_codes)
+        attack_types = {ATTACK_TYPE_BY_CODE[code]: int(type_counts[code]) for code in np.flatnonzero(type_counts)}
         signature = list(attack_types.keys())
+        type_mask = 0
+        for code in np.flatnonzero(type_counts):
+            type_mask |= 1 << (int(code) - 1)
         
-        time_diffs = []
-        for i in range(1, len(timestamps)):
-            diff = (timestamps[i] - timestamps[i-1]).total_seconds() / 60
-            time_diffs.append(diff)
-        avg_interval = np.mean(time_diffs) if time_diffs else 0
+        avg_interval = float(np.diff(timestamps).mean()) / 60 if len(timestamps) > 1 else 0
         
-        attribution = self._attribute_threat_actor(signature, primary_country, avg_interval, len(attacks))
+        attribution = self._attribute_threat_actor(type_mask, primary_code, avg_interval, num_attacks)
         
         campaign_id = f"CAMPAIGN_{self.next_campaign_id:04d}"
         self.next_campaign_id += 1
@@ -182,28 +190,27 @@ class CampaignDetector:
             "start_time": start_time.isoformat(),
             "end_time": end_time.isoformat(),
             "duration_minutes": round(duration_minutes, 2),
-            "num_attacks": len(attacks),
+            "num_attacks": num_attacks,
             "attack_ids": attack_ids,
             "primary_source_country": primary_country,
-            "attack_types": dict(attack_types),
+            "attack_types": attack_types,
             "signature": signature,
             "avg_interval_minutes": round(avg_interval, 2),
             "attributed_actor": attribution['actor'],
             "confidence": attribution['confidence'],
             "sophistication": attribution['sophistication'],
-            "severity_score": self._calculate_severity(attacks)
+            "severity_score": self._calculate_severity([r.attack for r in records])
         }
         
-        self.campaigns[campaign_id] = campaign
         return campaign
     
-    def _attribute_threat_actor(self, attack_types, country, interval, num_attacks):
+    def _attribute_threat_actor(self, type_mask, country_code, interval, num_attacks):
         """Enhanced attribution with 87% accuracy"""
         
-        sig_score = self._get_signature_score(attack_types)
-        geo_score = self._get_geographic_score(country)
+        sig_score = self._get_signature_score(type_mask)
+        geo_score = self._get_geographic_score(country_code)
         timing_score = self._get_timing_score(interval, num_attacks)
-        op_score = self._get_operational_score(attack_types, num_attacks)
+        op_score = self._get_operational_score(type_mask, num_attacks)
         
         weighted_confidence = (
             sig_score * 0.40 +
@@ -216,10 +223,10 @@ class CampaignDetector:
         if sig_score >= 0.90 and geo_score >= 0.88 and timing_score >= 0.75:
             actor = "State-Sponsored APT"
             confidence = 0.92
-        elif "Ransomware" in attack_types and sig_score >= 0.85 and op_score >= 0.65:
+        elif type_mask & RANSOMWARE_BIT and sig_score >= 0.85 and op_score >= 0.65:
             actor = "Criminal Organization"
             confidence = 0.89
-        elif set(attack_types) == {"DDoS"} and timing_score >= 0.70:
+        elif type_mask == DDOS_BIT and timing_score >= 0.70:
             actor = "Hacktivist Collective"
             confidence = 0.85
         elif sig_score <= 0.65 and op_score <= 0.50:
@@ -235,26 +242,11 @@ class CampaignDetector:
             "sophistication": "High" if sig_score >= 0.85 else "Medium" if sig_score >= 0.60 else "Low"
         }
     
-    def _get_signature_score(self, attack_types):
-        attack_set = set(attack_types)
-        if attack_set.issuperset({"DDoS", "Malware"}):
-            return 0.95
-        elif "Ransomware" in attack_types and "Malware" in attack_types:
-            return 0.90
-        elif attack_set == {"DDoS"}:
-            return 0.80
-        elif attack_set == {"Brute Force"}:
-            return 0.60
-        else:
-            return 0.50
+    def _get_signature_score(self, type_mask):
+        return SIGNATURE_SCORE_TABLE[type_mask]
     
-    def _get_geographic_score(self, country):
-        geo_profiles = {
-            "Russia": 0.92, "China": 0.90, "Iran": 0.88,
-            "North Korea": 0.91, "United States": 0.75,
-            "Brazil": 0.80, "Romania": 0.82
-        }
-        return geo_profiles.get(country, 0.40)
+    def _get_geographic_score(self, country_code):
+        return GEO_SCORE_TABLE[country_code]
     
     def _get_timing_score(self, interval, num_attacks):
         if num_attacks < 3:
@@ -270,11 +262,12 @@ class CampaignDetector:
         else:
             return 0.45
     
-    def _get_operational_score(self, attack_types, num_attacks):
+    def _get_operational_score(self, type_mask, num_attacks):
+        num_types = TYPE_COUNT_TABLE[type_mask]
         score = 0.50
-        if len(set(attack_types)) >= 3:
+        if num_types >= 3:
             score += 0.25
-        elif len(set(attack_types)) >= 2:
+        elif num_types >= 2:
             score += 0.15
         if num_attacks > 15:
             score += 0.20
@@ -283,7 +276,7 @@ class CampaignDetector:
         return min(1.0, score)
     
     def _calculate_severity(self, attacks):
-        avg_intensity = np.mean([a['intensity'] for a in attacks])
+        avg_intensity = float(np.mean([a['intensity'] for a in attacks]))
         num_attacks = len(attacks)
         severity = min(10, (avg_intensity * 0.6) + (min(num_attacks, 10) * 0.4))
         return round(severity, 2)
@@ -293,17 +286,24 @@ class CampaignDetector:
 # ============================================================================
 
 active_connections: Set[WebSocket] = set()
-ip_request_tracker = defaultdict(list)
+ip_request_tracker: Dict[str, Deque[float]] = defaultdict(deque)
 hourly_traffic = defaultdict(int)
 status_codes = Counter()
 ip_paths = defaultdict(list)
 geo_distribution = Counter()
 attack_types_distribution = Counter()
 detected_bots = set()
-attack_history = []
+total_hourly = 0
+total_status = 0
+total_geo = 0
 MAX_HISTORY = 5000
+MIN_ATTACKS_FOR_CAMPAIGNS = 50
+CAMPAIGN_REFRESH_SECONDS = 30
+attacks_generated = 0
+attack_history: Deque[AttackRecord] = deque(maxlen=MAX_HISTORY)
 
-campaign_detector = CampaignDetector()
+campaign_detector = CampaignDetector(max_tracked_attacks=MAX_HISTORY)
+campaign_detection_lock: Optional[asyncio.Lock] = None  # created on the server's loop at startup
 
 # ============================================================================
 # CONSTANTS
@@ -330,16 +330,54 @@ COUNTRIES = {
 ATTACK_TYPES = ["DDoS", "Botnet", "Ransomware", "Malware", "Phishing", "SQL Injection", "XSS", "Brute Force"]
 STATUS_CODES = [200, 301, 404, 500, 403, 503]
 
+_COUNTRY_NAMES = list(COUNTRIES.keys())
+_COUNTRY_LATS = [coords["lat"] for coords in COUNTRIES.values()]
+_COUNTRY_LNGS = [coords["lng"] for coords in COUNTRIES.values()]
+
+# Numeric codes used as campaign features (0 is reserved for unknown values)
+COUNTRY_CODE = {country: i + 1 for i, country in enumerate(COUNTRIES)}
+ATTACK_TYPE_CODE = {attack_type: i + 1 for i, attack_type in enumerate(ATTACK_TYPES)}
+COUNTRY_BY_CODE = ["Unknown", *COUNTRIES]
+ATTACK_TYPE_BY_CODE = ["Unknown", *ATTACK_TYPES]
+
+# Attribution lookup tables. A campaign's attack types are a bitmask with
+# bit (code - 1) set for each type present.
+DDOS_BIT = 1 << (ATTACK_TYPE_CODE["DDoS"] - 1)
+RANSOMWARE_BIT = 1 << (ATTACK_TYPE_CODE["Ransomware"] - 1)
+MALWARE_BIT = 1 << (ATTACK_TYPE_CODE["Malware"] - 1)
+BRUTE_FORCE_BIT = 1 << (ATTACK_TYPE_CODE["Brute Force"] - 1)
+
+def _signature_score(type_mask):
+    if type_mask & (DDOS_BIT | MALWARE_BIT) == DDOS_BIT | MALWARE_BIT:
+        return 0.95
+    elif type_mask & RANSOMWARE_BIT and type_mask & MALWARE_BIT:
+        return 0.90
+    elif type_mask == DDOS_BIT:
+        return 0.80
+    elif type_mask == BRUTE_FORCE_BIT:
+        return 0.60
+    else:
+        return 0.50
+
+GEO_PROFILES = {
+    "Russia": 0.92, "China": 0.90, "Iran": 0.88,
+    "North Korea": 0.91, "United States": 0.75,
+    "Brazil": 0.80, "Romania": 0.82
+}
+SIGNATURE_SCORE_TABLE = tuple(_signature_score(mask) for mask in range(1 << len(ATTACK_TYPES)))
+TYPE_COUNT_TABLE = tuple(bin(mask).count("1") for mask in range(1 << len(ATTACK_TYPES)))
+GEO_SCORE_TABLE = tuple(GEO_PROFILES.get(country, 0.40) for country in COUNTRY_BY_CODE)
+
 # ============================================================================
 # ANALYTICS FUNCTIONS
 # ============================================================================
 
 def check_bot_behavior(ip: str) -> bool:
     """Detect if IP is a bot (>100 requests/min)"""
-    now = datetime.now()
-    one_minute_ago = now - timedelta(minutes=1)
-    recent_requests = [ts for ts in ip_request_tracker[ip] if ts > one_minute_ago]
-    ip_request_tracker[ip] = recent_requests
+    one_minute_ago = time.time() - 60
+    recent_requests = ip_request_tracker[ip]
+    while recent_requests and recent_requests[0] <= one_minute_ago:
+        recent_requests.popleft()
     if len(recent_requests) > 100:
         detected_bots.add(ip)
         return True
@@ -347,51 +385,62 @@ def check_bot_behavior(ip: str) -> bool:
 
 def track_request(ip: str, path: str, status_code: int):
     """Track request for analytics"""
+    global total_hourly, total_status
     now = datetime.now()
-    ip_request_tracker[ip].append(now)
+    ip_request_tracker[ip].append(now.timestamp())
     hourly_traffic[now.hour] += 1
+    total_hourly += 1
     status_codes[status_code] += 1
+    total_status += 1
     ip_paths[ip].append({"path": path, "timestamp": now.isoformat(), "status_code": status_code})
     check_bot_behavior(ip)
 
 def generate_mock_attack():
     """Generate mock attack with analytics tracking"""
-    source_country = random.choice(list(COUNTRIES.keys()))
-    target_country = random.choice(list(COUNTRIES.keys()))
-    while target_country == source_country:
-        target_country = random.choice(list(COUNTRIES.keys()))
+    global total_geo, attacks_generated
+    # Offset the target index by 1..n-1 so it always differs from the source
+    num_countries = len(_COUNTRY_NAMES)
+    source_idx = random.randrange(num_countries)
+    target_idx = (source_idx + 1 + random.randrange(num_countries - 1)) % num_countries
     
-    source_coords = COUNTRIES[source_country]
-    target_coords = COUNTRIES[target_country]
+    source_country = _COUNTRY_NAMES[source_idx]
+    target_country = _COUNTRY_NAMES[target_idx]
     
-    source_ip = f"{random.randint(1, 255)}.{random.randint(1, 255)}.{random.randint(1, 255)}.{random.randint(1, 255)}"
+    source_ip = f"{random.randrange(1, 256)}.{random.randrange(1, 256)}.{random.randrange(1, 256)}.{random.randrange(1, 256)}"
     attack_type = random.choice(ATTACK_TYPES)
     status_code = random.choice(STATUS_CODES)
     
     track_request(source_ip, f"/{attack_type.lower()}", status_code)
     
     geo_distribution[source_country] += 1
+    total_geo += 1
     attack_types_distribution[attack_type] += 1
     
+    now = datetime.now(timezone.utc)
     attack = {
-        "id": f"attack_{random.randint(1000, 9999)}_{int(datetime.now().timestamp())}",
+        "id": f"attack_{random.randint(1000, 9999)}_{int(now.timestamp())}",
         "attack_type": attack_type,
         "source_country": source_country,
         "target_country": target_country,
         "source_ip": source_ip,
-        "source_lat": source_coords["lat"] + random.uniform(-2, 2),
-        "source_lng": source_coords["lng"] + random.uniform(-2, 2),
-        "target_lat": target_coords["lat"] + random.uniform(-2, 2),
-        "target_lng": target_coords["lng"] + random.uniform(-2, 2),
+        "source_lat": _COUNTRY_LATS[source_idx] + random.uniform(-2, 2),
+        "source_lng": _COUNTRY_LNGS[source_idx] + random.uniform(-2, 2),
+        "target_lat": _COUNTRY_LATS[target_idx] + random.uniform(-2, 2),
+        "target_lng": _COUNTRY_LNGS[target_idx] + random.uniform(-2, 2),
         "intensity": random.randint(1, 10),
-        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "timestamp": now.isoformat(),
         "status_code": status_code,
         "is_bot": source_ip in detected_bots
     }
     
-    attack_history.append(attack)
-    if len(attack_history) > MAX_HISTORY:
-        attack_history.pop(0)
+    attack_history.append(AttackRecord(
+        attack,
+        now.timestamp(),
+        COUNTRY_CODE[source_country],
+        COUNTRY_CODE[target_country],
+        ATTACK_TYPE_CODE[attack_type]
+    ))
+    attacks_generated += 1
     
     return attack
 
@@ -399,13 +448,13 @@ async def broadcast_message(msg_type: str, data: dict):
     """Broadcast to all connected clients"""
     if not active_connections:
         return
-    message = json.dumps({"type": msg_type, "data": data})
-    disconnected = set()
-    for ws in active_connections:
-        try:
-            await ws.send_text(message)
-        except:
-            disconnected.add(ws)
+    message = orjson.dumps({"type": msg_type, "data": data}).decode()
+    connections = list(active_connections)
+    results = await asyncio.gather(
+        *(ws.send_text(message) for ws in connections),
+        return_exceptions=True
+    )
+    disconnected = {ws for ws, result in zip(connections, results) if isinstance(result, Exception)}
     active_connections.difference_update(disconnected)
 
 async def attack_generator():
@@ -419,38 +468,56 @@ async def attack_generator():
         except Exception as e:
             print(f"Error in attack generator: {e}")
 
+async def refresh_campaigns():
+    """Re-run campaign detection in a worker thread, one run at a time"""
+    async with campaign_detection_lock:
+        if campaign_detector.is_stale(attacks_generated):
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, campaign_detector.refresh, list(attack_history), attacks_generated)
+
+async def campaign_refresher():
+    """Re-detect campaigns off the event loop once enough new attacks arrive"""
+    while True:
+        try:
+            await asyncio.sleep(CAMPAIGN_REFRESH_SECONDS)
+            if len(attack_history) >= MIN_ATTACKS_FOR_CAMPAIGNS:
+                await refresh_campaigns()
+        except Exception as e:
+            print(f"Error in campaign refresher: {e}")
+
 # ============================================================================
 # ROUTES
 # ============================================================================
 
+def load_page(filename):
+    """Read an HTML page once so routes can serve it from memory"""
+    try:
+        with open(filename, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
 @app.on_event("startup")
 async def startup_event():
+    global campaign_detection_lock
+    campaign_detection_lock = asyncio.Lock()
+    app.state.index_html = load_page("index.html")
+    app.state.analytics_html = load_page("analytics.html")
     asyncio.create_task(attack_generator())
-    print("Server started. Attack generator running.")
+    asyncio.create_task(campaign_refresher())
+    print("Server started. Attack generator and campaign detection running.")
 
 @app.get("/analytics")
 async def serve_analytics():
-    try:
-        with open("analytics.html", "r", encoding="utf-8") as f:
-            return HTMLResponse(content=f.read())
-    except FileNotFoundError:
+    if app.state.analytics_html is None:
         return HTMLResponse(content="<h1>Error: analytics.html not found</h1>", status_code=404)
+    return HTMLResponse(content=app.state.analytics_html)
 
 @app.get("/")
 async def serve_index():
-    try:
-        with open("index.html", "r", encoding="utf-8") as f:
-            return HTMLResponse(content=f.read())
-    except FileNotFoundError:
-        return HTMLResponse(content="<h1>Error: index.html not found</h1>", status_code=404)
-
-@app.get("/")
-async def serve_index():
-    try:
-        with open("index.html", "r", encoding="utf-8") as f:
-            return HTMLResponse(content=f.read())
-    except FileNotFoundError:
+    if app.state.index_html is None:
         return HTMLResponse(content="<h1>Error: index.html not found</h1>", status_code=404)
+    return HTMLResponse(content=app.state.index_html)
 
 @app.get("/health")
 async def health_check():
@@ -465,15 +532,17 @@ async def health_check():
 
 @app.get("/api/campaigns")
 async def get_campaigns():
-    """Get all detected campaigns"""
-    if len(attack_history) < 50:
-        return {"campaigns": [], "message": f"Need {50 - len(attack_history)} more attacks to detect campaigns"}
+    """Get the most recently detected campaigns"""
+    if len(attack_history) < MIN_ATTACKS_FOR_CAMPAIGNS:
+        return {"campaigns": [], "message": f"Need {MIN_ATTACKS_FOR_CAMPAIGNS - len(attack_history)} more attacks to detect campaigns"}
     
-    campaigns = campaign_detector.detect_campaigns(attack_history)
+    if campaign_detector.is_stale(attacks_generated):
+        await refresh_campaigns()
+    campaigns, analyzed = campaign_detector.latest()
     return {
         "campaigns": campaigns,
         "total_detected": len(campaigns),
-        "total_attacks_analyzed": len(attack_history)
+        "total_attacks_analyzed": analyzed
     }
 
 @app.get("/api/analytics/bots")
@@ -495,23 +564,21 @@ async def get_bot_detection():
 async def get_peak_hours():
     sorted_hours = sorted(hourly_traffic.items(), key=lambda x: x[1], reverse=True)
     return {
-        "peak_hours": [{"hour": h, "requests": c, "percentage": round((c / sum(hourly_traffic.values()) * 100), 2)} for h, c in sorted_hours],
-        "total_requests": sum(hourly_traffic.values())
+        "peak_hours": [{"hour": h, "requests": c, "percentage": round((c / total_hourly * 100), 2)} for h, c in sorted_hours],
+        "total_requests": total_hourly
     }
 
 @app.get("/api/analytics/status-codes")
 async def get_status_codes():
-    total = sum(status_codes.values())
     return {
-        "distribution": [{"code": c, "count": cnt, "percentage": round((cnt / total * 100), 2)} for c, cnt in status_codes.most_common()],
-        "total_requests": total
+        "distribution": [{"code": c, "count": cnt, "percentage": round((cnt / total_status * 100), 2)} for c, cnt in status_codes.most_common()],
+        "total_requests": total_status
     }
 
 @app.get("/api/analytics/geo-distribution")
 async def get_geo_distribution():
-    total = sum(geo_distribution.values())
     return {
-        "countries": [{"country": c, "count": cnt, "percentage": round((cnt / total * 100), 2)} for c, cnt in geo_distribution.most_common()],
+        "countries": [{"country": c, "count": cnt, "percentage": round((cnt / total_geo * 100), 2)} for c, cnt in geo_distribution.most_common()],
         "attack_types": [{"type": t, "count": cnt} for t, cnt in attack_types_distribution.most_common()]
     }
 
@@ -521,24 +588,24 @@ async def websocket_endpoint(websocket: WebSocket):
     active_connections.add(websocket)
     
     try:
-        await websocket.send_text(json.dumps({
+        await websocket.send_text(orjson.dumps({
             "type": "welcome",
             "data": {"message": "Connected to Cyber Threat Dashboard", "timestamp": datetime.now(timezone.utc).isoformat()}
-        }))
+        }).decode())
         
         initial_attack = generate_mock_attack()
-        await websocket.send_text(json.dumps({"type": "attack", "data": initial_attack}))
+        await websocket.send_text(orjson.dumps({"type": "attack", "data": initial_attack}).decode())
         
         while True:
             await asyncio.sleep(30)
-            await websocket.send_text(json.dumps({
+            await websocket.send_text(orjson.dumps({
                 "type": "stats",
                 "data": {
                     "active_connections": len(active_connections),
                     "total_attacks": len(attack_history),
                     "detected_bots": len(detected_bots)
                 }
-            }))
+            }).decode())
     except WebSocketDisconnect:
         pass
     finally: